@@ -8,38 +8,172 @@ from __future__ import annotations
 
 import argparse
 import csv
+import functools
+import http.client
+import itertools
 import json
 import os
+import random
+import re
 import sys
+import threading
 import time
+import unicodedata
 import urllib.parse
-import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Iterable, Tuple
+from typing import Any, Callable, Dict, Iterator, Tuple, TypeVar
+
+try:
+    import orjson
+except ImportError:  # optional speedup for large caches; stdlib json is used otherwise
+    orjson = None
 
 CENSUS_ENDPOINT = "https://geocoding.geo.census.gov/geocoder/locations/onelineaddress"
 CENSUS_BENCHMARK = "Public_AR_Current"
 GEOCODIO_ENDPOINT = "https://api.geocod.io/v1.7/geocode"
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
+USER_AGENT = "wop-org-map-geocoder/1.0"
+DEFAULT_RATE = 5.0
+MIN_RATE_LIMIT_PAUSE = 1.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# The server turned the request away before doing any work, so even a POST can be resent.
+THROTTLE_STATUSES = {429, 503}
+# Longest Retry-After we will wait out; a longer request is treated as a failed lookup.
+MAX_RETRY_AFTER = 60.0
+CACHE_FLUSH_EVERY = 100
+CSV_FLUSH_EVERY = 100
+PROGRESS_INTERVAL = 0.1
+QUERY_COLUMNS = ("Address", "City", "States")
+NORMALIZE_CACHE_SIZE = 4096
+GEOCODIO_BATCH_SIZE = 1000
+GEOCODIO_BATCH_TIMEOUT = 300.0
+# Rejections of the batch itself (too large, malformed); single lookups may still succeed.
+# Others, such as 401/402/403 for a bad key or spent quota, would fail per query too.
+BATCH_FALLBACK_STATUSES = {413, 422}
+GEOCODE_FIELDS = [
+    "latitude",
+    "longitude",
+    "geocode_source",
+    "geocode_input",
+    "matched_address",
+    "match_type",
+]
+
+MISSING_QUERY_RESULT = {
+    "latitude": "",
+    "longitude": "",
+    "geocode_source": "missing_query",
+    "geocode_input": "",
+    "matched_address": "",
+    "match_type": "",
+}
+
+STATE_ABBREVIATIONS = {
+    "ALABAMA": "AL", "ALASKA": "AK", "ARIZONA": "AZ", "ARKANSAS": "AR", "CALIFORNIA": "CA",
+    "COLORADO": "CO", "CONNECTICUT": "CT", "DELAWARE": "DE", "DISTRICT OF COLUMBIA": "DC",
+    "FLORIDA": "FL", "GEORGIA": "GA", "HAWAII": "HI", "IDAHO": "ID", "ILLINOIS": "IL",
+    "INDIANA": "IN", "IOWA": "IA", "KANSAS": "KS", "KENTUCKY": "KY", "LOUISIANA": "LA",
+    "MAINE": "ME", "MARYLAND": "MD", "MASSACHUSETTS": "MA", "MICHIGAN": "MI", "MINNESOTA": "MN",
+    "MISSISSIPPI": "MS", "MISSOURI": "MO", "MONTANA": "MT", "NEBRASKA": "NE", "NEVADA": "NV",
+    "NEW HAMPSHIRE": "NH", "NEW JERSEY": "NJ", "NEW MEXICO": "NM", "NEW YORK": "NY",
+    "NORTH CAROLINA": "NC", "NORTH DAKOTA": "ND", "OHIO": "OH", "OKLAHOMA": "OK", "OREGON": "OR",
+    "PENNSYLVANIA": "PA", "PUERTO RICO": "PR", "RHODE ISLAND": "RI", "SOUTH CAROLINA": "SC",
+    "SOUTH DAKOTA": "SD", "TENNESSEE": "TN", "TEXAS": "TX", "UTAH": "UT", "VERMONT": "VT",
+    "VIRGINIA": "VA", "WASHINGTON": "WA", "WEST VIRGINIA": "WV", "WISCONSIN": "WI", "WYOMING": "WY",
+}
+# A spelled-out state name, only where it ends the address (optionally before a ZIP),
+# so street names like "Washington Ave" are left alone.
+STATE_NAME_RE = re.compile(
+    r"\b(" + "|".join(sorted(STATE_ABBREVIATIONS, key=len, reverse=True)) + r")(?=(?: \d{5}(?:-\d{4})?)?$)"
+)
+
+# provider -> normalized query -> geocode result
+GeocodeCache = Dict[str, Dict[str, dict[str, str]]]
+
+CENSUS_URL = urllib.parse.urlsplit(CENSUS_ENDPOINT)
+GEOCODIO_URL = urllib.parse.urlsplit(GEOCODIO_ENDPOINT)
+
+
+def iter_csv(path: Path) -> Iterator[list[str]]:
+    """Yield the header and then each row as a list, skipping blank lines like DictReader."""
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.reader(f):
+            if row:
+                yield row
 
 
-def load_csv(path: Path) -> list[dict[str, str]]:
-    with path.open("r", encoding="utf-8-sig", newline="") as f:
-        return list(csv.DictReader(f))
+def is_lookup_error(result: dict[str, str]) -> bool:
+    return result.get("geocode_source", "").endswith("_lookup_error")
+
 
+def has_coordinates(result: dict[str, str]) -> bool:
+    return bool(result.get("latitude") and result.get("longitude"))
 
-def save_csv(path: Path, rows: Iterable[dict[str, str]], fieldnames: list[str]) -> None:
+
+def load_cache(path: Path) -> GeocodeCache:
+    """Load the {provider: {normalized query: result}} cache.
+
+    Caches written in the older flat {"provider::query": result} layout, or
+    keyed by raw queries, are migrated on load. Lookup errors left by older
+    runs are dropped so they are retried.
+    """
+    if not path.exists():
+        return {}
+    if orjson is not None:
+        raw = orjson.loads(path.read_bytes())
+    else:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+
+    cache: GeocodeCache = {}
+    for key, value in raw.items():
+        if "geocode_source" in value:
+            provider, _, query = key.partition("::")
+            entries = {query: value}
+        else:
+            provider, entries = key, value
+        bucket = cache.setdefault(provider, {})
+        for query, result in entries.items():
+            if is_lookup_error(result):
+                continue
+            key = normalize_query(query)
+            # Spellings that now share a key: keep a coordinate hit over a no-match.
+            current = bucket.get(key)
+            if current is None or (not has_coordinates(current) and has_coordinates(result)):
+                bucket[key] = result
+    return cache
+
+
+def save_cache(path: Path, cache: GeocodeCache) -> None:
+    """Write the cache via a temp file so an interrupted write never truncates it.
+
+    Lookup errors stay in memory for this run's output but are never persisted.
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    persisted = {
+        provider: {query: result for query, result in bucket.items() if not is_lookup_error(result)}
+        for provider, bucket in cache.items()
+    }
+    tmp_path = path.with_name(path.name + ".tmp")
+    if orjson is not None:
+        tmp_path.write_bytes(orjson.dumps(persisted, option=orjson.OPT_INDENT_2))
+    else:
+        tmp_path.write_text(json.dumps(persisted, ensure_ascii=True, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
 
+def query_columns(header: list[str]) -> Tuple[int, int, int]:
+    """Indexes of the Address, City and States columns, -1 for any that are absent."""
+    address_i, city_i, state_i = (header.index(name) if name in header else -1 for name in QUERY_COLUMNS)
+    return address_i, city_i, state_i
 
-def build_query(row: dict[str, str]) -> str:
-    address = (row.get("Address") or "").strip().strip(",")
-    city = (row.get("City") or "").strip()
-    state = (row.get("States") or "").strip()
+
+def build_query(row: list[str], columns: Tuple[int, int, int]) -> str:
+    address_i, city_i, state_i = columns
+    width = len(row)
+    address = (row[address_i] if 0 <= address_i < width else "").strip().strip(",")
+    city = (row[city_i] if 0 <= city_i < width else "").strip()
+    state = (row[state_i] if 0 <= state_i < width else "").strip()
 
     if address:
         return address
@@ -50,18 +184,26 @@ def build_query(row: dict[str, str]) -> str:
     return ""
 
 
+@functools.lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_query(query: str) -> str:
+    """Cache key for a query: accents, case, punctuation, spacing and state names folded.
+
+    "123 Main St., Springfield, Illinois" and "123 main st springfield IL" share a key.
+    The original query is still what gets sent to the geocoder.
+    """
+    text = unicodedata.normalize("NFKD", query)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = " ".join(re.sub(r"[.,#]", " ", text.upper()).split())
+    return STATE_NAME_RE.sub(lambda m: STATE_ABBREVIATIONS[m.group(1)], text)
+
+
 def load_dotenv_key(dotenv_path: Path, key_name: str) -> str:
     if not dotenv_path.exists():
         return ""
 
-    for line in dotenv_path.read_text(encoding="utf-8").splitlines():
-        stripped = line.strip()
-        if not stripped or stripped.startswith("#") or "=" not in stripped:
-            continue
-        k, v = stripped.split("=", 1)
-        if k.strip() == key_name:
-            return v.strip().strip("'").strip('"')
-    return ""
+    pattern = rf"^[ \t]*{re.escape(key_name)}[ \t]*=[ \t]*['\"]?([^'\"\n]*)"
+    match = re.search(pattern, dotenv_path.read_text(encoding="utf-8"), re.M)
+    return match.group(1).strip() if match else ""
 
 
 def load_key_from_file(path: Path) -> str:
@@ -71,20 +213,241 @@ def load_key_from_file(path: Path) -> str:
     return value
 
 
+class ConnectionPool:
+    """Keep-alive HTTPS connections shared across worker threads, keyed by host."""
+
+    def __init__(self, maxsize: int = 64) -> None:
+        self.maxsize = maxsize
+        self._idle: dict[str, list[http.client.HTTPSConnection]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str, timeout: float) -> http.client.HTTPSConnection:
+        with self._lock:
+            idle = self._idle.get(host)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            return http.client.HTTPSConnection(host, timeout=timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def put(self, host: str, conn: http.client.HTTPSConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(host, [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        conn.close()
+
+
+HTTP_POOL = ConnectionPool()
+
+
+class RateLimiter:
+    """Token bucket shared by all worker threads, retuned from rate-limit response headers.
+
+    Starts at the configured rate. When a response carries X-RateLimit-Remaining
+    and X-RateLimit-Reset, the rate is set, up or down, to spread the remaining
+    quota over the rest of the window. Once the quota is spent, all requests
+    pause until the reset (or MIN_RATE_LIMIT_PAUSE if no reset is given). A
+    rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self._lock = threading.Lock()
+        self.configure(rate)
+
+    def configure(self, rate: float) -> None:
+        with self._lock:
+            self.base_rate = rate
+            self.rate = rate
+            self._tokens = 1.0
+            self._updated = time.monotonic()
+            self._paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def wait(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self.rate <= 0:
+                    return
+                else:
+                    self._tokens = min(1.0, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    delay = (1.0 - self._tokens) / self.rate
+            time.sleep(delay)
+
+    def observe(self, resp: http.client.HTTPResponse) -> None:
+        remaining = _header_seconds(resp, "X-RateLimit-Remaining")
+        if remaining is None:
+            return
+        reset = _header_seconds(resp, "X-RateLimit-Reset")
+        if reset is not None and reset > 1e9:  # an epoch timestamp rather than seconds until reset
+            reset = max(0.0, reset - time.time())
+
+        if remaining < 1:
+            self.pause(reset if reset else MIN_RATE_LIMIT_PAUSE)
+            return
+        if reset is None:
+            return
+        with self._lock:
+            if self.base_rate > 0:
+                self.rate = remaining / max(reset, 1.0)
+
+
+RATE_LIMITER = RateLimiter(DEFAULT_RATE)
+
+
+class TransientHTTPError(http.client.HTTPException):
+    """A 429/5xx response worth retrying, with the server's Retry-After delay if given."""
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ThrottledError(TransientHTTPError):
+    """A 429/503 response: the server declined to process the request for now."""
+
+
+class RequestNotSentError(ConnectionError):
+    """Connecting failed, so the server never saw the request; safe to retry even for a POST."""
+
+
+class RejectedRequestError(http.client.HTTPException):
+    """A 4xx response other than 429: the server refused the request without processing it."""
+
+    def __init__(self, message: str, status: int) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _header_seconds(resp: http.client.HTTPResponse, name: str) -> float | None:
+    value = resp.getheader(name)
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+def fetch_json(
+    url: urllib.parse.SplitResult,
+    params: dict[str, str],
+    timeout: float,
+    body: object = None,
+) -> dict:
+    """Request url, sending a GET over a pooled connection or a POST with body as JSON.
+
+    A GET on a pooled connection the server has dropped is resent once on a new
+    connection. A POST is not idempotent, so it always gets a fresh connection
+    and is never resent once it may have reached the server.
+    """
+    path = f"{url.path}?{urllib.parse.urlencode(params)}"
+    headers = {"User-Agent": USER_AGENT, "Connection": "keep-alive"}
+    method = "GET"
+    data = None
+    if body is not None:
+        method = "POST"
+        data = json.dumps(body).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+
+    for attempt in range(2):
+        RATE_LIMITER.wait()
+        if data is None:
+            conn = HTTP_POOL.get(url.netloc, timeout)
+        else:
+            conn = http.client.HTTPSConnection(url.netloc, timeout=timeout)
+            try:
+                conn.connect()
+            except OSError as exc:
+                conn.close()
+                raise RequestNotSentError(f"could not connect to {url.netloc}") from exc
+        try:
+            conn.request(method, path, body=data, headers=headers)
+            resp = conn.getresponse()
+            raw = resp.read()
+        except (http.client.BadStatusLine, ConnectionError):
+            conn.close()
+            if attempt or data is not None:
+                raise
+            continue
+        except Exception:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            HTTP_POOL.put(url.netloc, conn)
+        RATE_LIMITER.observe(resp)
+        if resp.status in RETRY_STATUSES:
+            retry_after = _header_seconds(resp, "Retry-After")
+            if resp.status == 429:
+                # Hold back every worker, not just the one that got throttled.
+                RATE_LIMITER.pause(min(retry_after if retry_after is not None else 1.0, MAX_RETRY_AFTER))
+            if retry_after is not None and retry_after > MAX_RETRY_AFTER:
+                raise http.client.HTTPException(
+                    f"HTTP {resp.status} from {url.netloc} asks to retry after {retry_after:.0f}s; giving up"
+                )
+            error = ThrottledError if resp.status in THROTTLE_STATUSES else TransientHTTPError
+            raise error(f"HTTP {resp.status} from {url.netloc}", retry_after=retry_after)
+        if resp.status >= 400:
+            raise RejectedRequestError(f"HTTP {resp.status} from {url.netloc}", status=resp.status)
+        return json.loads(raw.decode("utf-8"))
+
+    raise http.client.HTTPException(f"no response from {url.netloc}")
+
+
+RETRYABLE_ERRORS = (TransientHTTPError, http.client.BadStatusLine, OSError)
+# For POSTs, only errors that guarantee the request was not processed. A 500/502/504
+# may come after the upstream already did (and billed) the work, like a read timeout.
+RETRYABLE_POST_ERRORS = (ThrottledError, RequestNotSentError)
+
+
+T = TypeVar("T")
+
+
+def _with_retry(
+    fn: Callable[..., T],
+    *args: Any,
+    max_tries: int = 4,
+    base: float = 0.5,
+    retry_on: tuple[type[BaseException], ...] = RETRYABLE_ERRORS,
+    **kwargs: Any,
+) -> T:
+    """Call fn, retrying retry_on errors with exponential backoff (or the server's Retry-After)."""
+    for attempt in range(max_tries):
+        try:
+            return fn(*args, **kwargs)
+        except retry_on as exc:
+            if attempt == max_tries - 1:
+                raise
+            delay = getattr(exc, "retry_after", None)
+            if delay is None:
+                delay = base * 2**attempt + random.random() * 0.1
+            time.sleep(min(delay, MAX_RETRY_AFTER))
+    raise ValueError("max_tries must be at least 1")
+
+
 def geocode_census(query: str, timeout: float) -> dict[str, str]:
-    params = urllib.parse.urlencode(
-        {
-            "address": query,
-            "benchmark": CENSUS_BENCHMARK,
-            "format": "json",
-        }
-    )
-    url = f"{CENSUS_ENDPOINT}?{params}"
-    req = urllib.request.Request(url, headers={"User-Agent": "wop-org-map-geocoder/1.0"})
+    params = {
+        "address": query,
+        "benchmark": CENSUS_BENCHMARK,
+        "format": "json",
+    }
 
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            payload = json.loads(resp.read().decode("utf-8"))
+        payload = _with_retry(fetch_json, CENSUS_URL, params, timeout=timeout)
     except Exception:
         return {
             "latitude": "",
@@ -118,25 +481,7 @@ def geocode_census(query: str, timeout: float) -> dict[str, str]:
     }
 
 
-def geocode_geocodio(query: str, api_key: str, timeout: float) -> dict[str, str]:
-    params = urllib.parse.urlencode({"q": query, "api_key": api_key})
-    url = f"{GEOCODIO_ENDPOINT}?{params}"
-    req = urllib.request.Request(url, headers={"User-Agent": "wop-org-map-geocoder/1.0"})
-
-    try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            payload = json.loads(resp.read().decode("utf-8"))
-    except Exception:
-        return {
-            "latitude": "",
-            "longitude": "",
-            "geocode_source": "geocodio_lookup_error",
-            "geocode_input": query,
-            "matched_address": "",
-            "match_type": "",
-        }
-
-    results = payload.get("results", [])
+def _geocodio_result(query: str, results: list[dict]) -> dict[str, str]:
     if not results:
         return {
             "latitude": "",
@@ -159,16 +504,61 @@ def geocode_geocodio(query: str, api_key: str, timeout: float) -> dict[str, str]
     }
 
 
+def _geocodio_error(query: str) -> dict[str, str]:
+    return {
+        "latitude": "",
+        "longitude": "",
+        "geocode_source": "geocodio_lookup_error",
+        "geocode_input": query,
+        "matched_address": "",
+        "match_type": "",
+    }
+
+
+def geocode_geocodio(query: str, api_key: str, timeout: float) -> dict[str, str]:
+    try:
+        payload = _with_retry(fetch_json, GEOCODIO_URL, {"q": query, "api_key": api_key}, timeout=timeout)
+    except Exception:
+        return _geocodio_error(query)
+
+    return _geocodio_result(query, payload.get("results", []))
+
+
+def geocode_geocodio_batch(queries: list[str], api_key: str, timeout: float) -> Dict[str, dict[str, str]]:
+    """Geocode up to 10,000 queries in one POST; results come back in input order.
+
+    Raises RejectedRequestError if the server refused the batch itself (a status
+    in BATCH_FALLBACK_STATUSES), so the caller can fall back to single lookups.
+    Any other failure marks every query as a lookup error.
+    """
+    try:
+        payload = _with_retry(
+            fetch_json,
+            GEOCODIO_URL,
+            {"api_key": api_key},
+            timeout=timeout,
+            body=queries,
+            retry_on=RETRYABLE_POST_ERRORS,
+        )
+        items = payload["results"]
+        if len(items) != len(queries):
+            raise ValueError(f"expected {len(queries)} batch results, got {len(items)}")
+    except RejectedRequestError as exc:
+        if exc.status in BATCH_FALLBACK_STATUSES:
+            raise
+        return {query: _geocodio_error(query) for query in queries}
+    except Exception:
+        return {query: _geocodio_error(query) for query in queries}
+
+    return {
+        query: _geocodio_result(query, (item.get("response") or {}).get("results", []))
+        for query, item in zip(queries, items)
+    }
+
+
 def geocode(query: str, provider: str, geocodio_key: str, timeout: float) -> dict[str, str]:
     if not query:
-        return {
-            "latitude": "",
-            "longitude": "",
-            "geocode_source": "missing_query",
-            "geocode_input": "",
-            "matched_address": "",
-            "match_type": "",
-        }
+        return dict(MISSING_QUERY_RESULT)
 
     if provider == "geocodio":
         return geocode_geocodio(query, api_key=geocodio_key, timeout=timeout)
@@ -176,9 +566,19 @@ def geocode(query: str, provider: str, geocodio_key: str, timeout: float) -> dic
     return geocode_census(query, timeout=timeout)
 
 
+_last_render = 0.0
+
+
 def render_progress(prefix: str, current: int, total: int, width: int = 28) -> None:
+    """Redraw the progress bar at most every PROGRESS_INTERVAL seconds, always drawing completion."""
+    global _last_render
     if total <= 0:
         return
+    now = time.monotonic()
+    if current < total and now - _last_render < PROGRESS_INTERVAL:
+        return
+    _last_render = now
+
     ratio = current / total
     filled = int(width * ratio)
     bar = "#" * filled + "-" * (width - filled)
@@ -189,64 +589,182 @@ def render_progress(prefix: str, current: int, total: int, width: int = 28) -> N
     sys.stdout.flush()
 
 
-def process_dataset(
-    in_path: Path,
-    out_path: Path,
-    cache: Dict[str, dict[str, str]],
-    sleep_sec: float,
+def geocode_many(
+    queries: list[str],
+    cache: GeocodeCache,
+    cache_path: Path,
     timeout: float,
     provider: str,
     geocodio_key: str,
-) -> Tuple[int, int]:
-    rows = load_csv(in_path)
-    if not rows:
-        save_csv(out_path, [], [])
-        return 0, 0
+    workers: int,
+    prefix: str,
+) -> None:
+    """Geocode queries concurrently into cache, flushing it to disk every CACHE_FLUSH_EVERY results.
+
+    Geocodio queries are sent through its batch endpoint in chunks of
+    GEOCODIO_BATCH_SIZE, falling back to one request per query for a batch the
+    server rejects as too large or malformed. Census queries are looked up one
+    at a time.
+    """
+
+    def lookup(batch: list[str]) -> Dict[str, dict[str, str]]:
+        if provider == "geocodio":
+            try:
+                return geocode_geocodio_batch(
+                    batch, api_key=geocodio_key, timeout=max(timeout, GEOCODIO_BATCH_TIMEOUT)
+                )
+            except RejectedRequestError:
+                pass  # nothing was processed, so single lookups cannot double-bill
+        return {query: geocode(query, provider=provider, geocodio_key=geocodio_key, timeout=timeout) for query in batch}
+
+    if not queries:
+        return
 
-    out_rows: list[dict[str, str]] = []
-    success = 0
-    total = len(rows)
-    prefix = in_path.stem
-
-    for i, row in enumerate(rows, start=1):
-        query = build_query(row)
-        cache_key = f"{provider}::{query}"
-
-        if cache_key not in cache:
-            cache[cache_key] = geocode(query, provider=provider, geocodio_key=geocodio_key, timeout=timeout)
-            if sleep_sec > 0:
-                time.sleep(sleep_sec)
-
-        result = cache.get(cache_key, {})
-        combined = dict(row)
-        combined.update(
-            {
-                "latitude": result.get("latitude", ""),
-                "longitude": result.get("longitude", ""),
-                "geocode_source": result.get("geocode_source", ""),
-                "geocode_input": result.get("geocode_input", query),
-                "matched_address": result.get("matched_address", ""),
-                "match_type": result.get("match_type", ""),
-            }
-        )
+    batch_size = GEOCODIO_BATCH_SIZE if provider == "geocodio" else 1
+    batches = [queries[i : i + batch_size] for i in range(0, len(queries), batch_size)]
 
-        if combined["latitude"] and combined["longitude"]:
-            success += 1
-        out_rows.append(combined)
-        render_progress(prefix, i, total)
-
-    fieldnames = list(rows[0].keys()) + [
-        "latitude",
-        "longitude",
-        "geocode_source",
-        "geocode_input",
-        "matched_address",
-        "match_type",
-    ]
-    save_csv(out_path, out_rows, fieldnames)
+    bucket = cache.setdefault(provider, {})
+    stored: set[Future[Dict[str, dict[str, str]]]] = set()
+
+    def store(future: Future[Dict[str, dict[str, str]]]) -> int:
+        stored.add(future)
+        results = future.result()
+        for query, result in results.items():
+            bucket[normalize_query(query)] = result
+        return len(results)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    futures: list[Future[Dict[str, dict[str, str]]]] = []
+    try:
+        futures = [pool.submit(lookup, batch) for batch in batches]
+        done = 0
+        unsaved = 0
+        for future in as_completed(futures):
+            count = store(future)
+            done += count
+            unsaved += count
+            if unsaved >= CACHE_FLUSH_EVERY:
+                save_cache(cache_path, cache)
+                unsaved = 0
+            render_progress(prefix, done, len(queries))
+    finally:
+        # On Ctrl-C, queued lookups are cancelled but those already in flight
+        # still run to completion; keep whatever they returned before saving.
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future in futures:
+            if future not in stored and not future.cancelled() and future.exception() is None:
+                store(future)
+        save_cache(cache_path, cache)
+
+
+def geocode_fields(bucket: Dict[str, dict[str, str]], query: str) -> list[str]:
+    """Output values for query, in GEOCODE_FIELDS order.
+
+    geocode_input is always the row's own query, even when the result was
+    fetched for another spelling that normalizes to the same key.
+    """
+    result = bucket.get(normalize_query(query), {}) if query else MISSING_QUERY_RESULT
+    fields = {field: result.get(field, "") for field in GEOCODE_FIELDS}
+    fields["geocode_input"] = query
+    return [fields[field] for field in GEOCODE_FIELDS]
+
+
+def write_dataset(
+    in_path: Path,
+    out_path: Path,
+    cache: GeocodeCache,
+    provider: str,
+) -> Tuple[int, int]:
+    """Stream in_path to out_path with geocode columns appended, one row at a time."""
+    rows = iter_csv(in_path)
+    header = next(rows, [])
+    first = next(rows, None)
+    columns = query_columns(header)
+    width = len(header)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    total = 0
+    success = 0
+    trimmed = 0
+    bucket = cache.get(provider, {})
+    # Output columns are resolved once per distinct query.
+    joined: Dict[str, list[str]] = {}
+
+    with out_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        if first is None:
+            writer.writerow([])
+            return 0, 0
+        writer.writerow(header + GEOCODE_FIELDS)
+
+        for row in itertools.chain([first], rows):
+            query = build_query(row, columns)
+            fields = joined.get(query)
+            if fields is None:
+                fields = joined[query] = geocode_fields(bucket, query)
+
+            # Keep the geocode columns under their headers: pad short rows and
+            # drop cells past the header from long ones.
+            if len(row) < width:
+                row = row + [""] * (width - len(row))
+            elif len(row) > width:
+                row = row[:width]
+                trimmed += 1
+            writer.writerow(row + fields)
+            total += 1
+            if fields[0] and fields[1]:
+                success += 1
+            if total % CSV_FLUSH_EVERY == 0:
+                f.flush()
+
+    if trimmed:
+        print(f"{in_path.name}: dropped extra cells past the header from {trimmed} rows", file=sys.stderr)
     return total, success
 
 
+def process_datasets(
+    datasets: list[tuple[Path, Path]],
+    cache: GeocodeCache,
+    cache_path: Path,
+    timeout: float,
+    provider: str,
+    geocodio_key: str,
+    workers: int,
+) -> list[tuple[str, int, int]]:
+    # Every dataset feeds one worker pool, and each distinct non-empty query
+    # (after normalization) is looked up at most once across all of them, using
+    # the first spelling seen. Rows without a query never reach the API or the
+    # cache. Only the queries are held in memory; rows are re-read and streamed
+    # out once geocoding is done.
+    wanted: Dict[str, str] = {}
+    total_rows = 0
+    for in_path, _ in datasets:
+        rows = iter_csv(in_path)
+        columns = query_columns(next(rows, []))
+        for row in rows:
+            total_rows += 1
+            query = build_query(row, columns)
+            if query:
+                wanted.setdefault(normalize_query(query), query)
+
+    bucket = cache.get(provider, {})
+    misses = sorted(query for key, query in wanted.items() if key not in bucket)
+    if misses:
+        print(f"{len(misses)} new lookups for {total_rows} rows")
+    geocode_many(
+        misses,
+        cache,
+        cache_path,
+        timeout=timeout,
+        provider=provider,
+        geocodio_key=geocodio_key,
+        workers=workers,
+        prefix="geocoding",
+    )
+
+    return [(in_path.name, *write_dataset(in_path, out_path, cache, provider)) for in_path, out_path in datasets]
+
+
 def resolve_provider(provider_arg: str, geocodio_key: str) -> str:
     if provider_arg in {"census", "geocodio"}:
         return provider_arg
@@ -270,7 +788,13 @@ def main() -> int:
         default=str(PROJECT_ROOT / "processed_data" / "geocode_cache.json"),
         help="Path to geocode cache JSON",
     )
-    parser.add_argument("--sleep", type=float, default=0.2, help="Delay between new geocode queries (seconds)")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_RATE,
+        help="Starting request rate per second, adjusted from provider rate-limit headers (0 disables)",
+    )
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent geocode requests in flight")
     parser.add_argument("--timeout", type=float, default=10.0, help="HTTP timeout (seconds)")
     parser.add_argument(
         "--provider",
@@ -304,9 +828,7 @@ def main() -> int:
     output_dir = Path(args.output_dir)
     cache_path = Path(args.cache)
 
-    cache: Dict[str, dict[str, str]] = {}
-    if cache_path.exists():
-        cache = json.loads(cache_path.read_text(encoding="utf-8"))
+    cache = load_cache(cache_path)
 
     datasets = [
         (input_dir / "asian_org.csv", output_dir / "asian_org_geocoded.csv"),
@@ -315,21 +837,19 @@ def main() -> int:
 
     print(f"Using provider: {provider}")
 
-    stats = []
-    for in_path, out_path in datasets:
-        total, success = process_dataset(
-            in_path,
-            out_path,
+    RATE_LIMITER.configure(args.rate)
+    try:
+        stats = process_datasets(
+            datasets,
             cache,
-            sleep_sec=args.sleep,
+            cache_path,
             timeout=args.timeout,
             provider=provider,
             geocodio_key=geocodio_key,
+            workers=args.workers,
         )
-        stats.append((in_path.name, total, success))
-
-    cache_path.parent.mkdir(parents=True, exist_ok=True)
-    cache_path.write_text(json.dumps(cache, ensure_ascii=True, indent=2), encoding="utf-8")
+    finally:
+        save_cache(cache_path, cache)
 
     for name, total, success in stats:
         print(f"{name}: geocoded {success}/{total}")